@@ -2,32 +2,74 @@ import streamlit as st
 import os
 import json
 from PIL import Image, ImageOps
-from PIL.ExifTags import TAGS
+import exifread
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 import datetime
 import logging
-import base64
 import hashlib
+import hmac
 import shutil
-import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from urllib.parse import quote
 
 # 定数の定義
 UPLOAD_DIR = "uploads"
 CONFIG_DIR = "config"
+# サムネイルはアプリの静的配信ディレクトリに置き、ブラウザ側でキャッシュさせる
+THUMB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "thumbs")
+# サムネイル縮小の最終フィルタ（300pxではLANCZOSとの画質差はほぼない）
+THUMB_FILTER = Image.Resampling.HAMMING
 PHOTO_CATEGORIES = ["風景", "ポートレート", "スナップ", "その他"]
+# 1ページあたりの写真数（サムネイル生成を画面分に抑える）
+PAGE_SIZE = 24
 CONFIG_FILES = {
     "profile": os.path.join(CONFIG_DIR, "profile.json"),
     "sns": os.path.join(CONFIG_DIR, "sns.json"),
     "metadata": os.path.join(CONFIG_DIR, "metadata.json")
 }
+# デバッグ時のみJSONを整形出力する（通常は非整形で書き込みコストを抑える）
+_JSON_DEBUG = bool(os.getenv("DEBUG_JSON"))
+# カテゴリー別ディレクトリのパス（毎回os.path.joinを組み立てない）
+_CATEGORY_DIRS = {c: os.path.join(UPLOAD_DIR, c) for c in PHOTO_CATEGORIES}
+
+# ディレクトリの初期化（再実行をまたいでプロセスごとに1回だけ行う）
+@st.cache_resource(show_spinner=False)
+def _ensure_dirs():
+    for directory in [UPLOAD_DIR, CONFIG_DIR, THUMB_DIR, *_CATEGORY_DIRS.values()]:
+        os.makedirs(directory, exist_ok=True)
+    return True
+
+_ensure_dirs()
 
-# ディレクトリの初期化
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(CONFIG_DIR, exist_ok=True)
-for category in PHOTO_CATEGORIES:
-    os.makedirs(os.path.join(UPLOAD_DIR, category), exist_ok=True)
+# ロギングの設定（書き込みはリスナースレッドに委譲し、呼び出し側を塞がない）
+LOG_FILE = "app.log"
 
-# ロギングの設定
-logging.basicConfig(level=logging.INFO)
+@st.cache_resource(show_spinner=False)
+def _setup_logging():
+    """ロギングの初期化（再実行をまたいでプロセスごとに1回だけ行う）"""
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(
+        log_queue,
+        RotatingFileHandler(
+            LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8'))
+    listener.start()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        handlers=[QueueHandler(log_queue)])
+    return listener
+
+_setup_logging()
+
+# 並列アップロード時のファイル名採番用ロック
+_upload_lock = threading.Lock()
 
 # セッション状態の初期化
 if 'current_page' not in st.session_state:
@@ -42,40 +84,69 @@ if 'fullscreen_photo' not in st.session_state:
     st.session_state.fullscreen_photo = None
 if 'user_likes' not in st.session_state:
     st.session_state.user_likes = set()
+if 'photo_page' not in st.session_state:
+    st.session_state.photo_page = 0
+if 'selected_photo' not in st.session_state:
+    st.session_state.selected_photo = None
+
+# パスワードハッシュ用のソルト（単一管理者向けの固定値）
+PASSWORD_SALT = b"photo-portfolio"
 
-# パスワードのハッシュ化
+# パスワードのハッシュ化（PBKDF2-HMAC-SHA256）
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return hashlib.pbkdf2_hmac(
+        "sha256", password.encode(), PASSWORD_SALT, 100_000).hex()
+
+@st.cache_resource(show_spinner=False)
+def _default_admin_hash():
+    """開発環境用デフォルトパスワードのハッシュ（初回参照時に1回だけ計算）"""
+    return hash_password("admin_password")
 
 def get_admin_password():
-    """パスワードを安全に取得"""
+    """パスワードを安全に取得
+
+    注意: ハッシュ方式がSHA-256からPBKDF2へ変わったため、
+    st.secrets["ADMIN_PASSWORD"] には旧SHA-256ハッシュではなく
+    PASSWORD_SALT・100,000回反復のPBKDF2-HMAC-SHA256の16進文字列を設定すること。
+    生成例:
+      python -c "import hashlib; print(hashlib.pbkdf2_hmac(
+          'sha256', b'パスワード', b'photo-portfolio', 100_000).hex())"
+    """
     try:
         return st.secrets["ADMIN_PASSWORD"]
     except:
         # 開発環境用のデフォルトパスワード（本番環境では必ず変更してください）
-        return hash_password("admin_password")
+        return _default_admin_hash()
 
 def check_password():
     """パスワード認証"""
     if not st.session_state.authenticated:
         password = st.text_input("パスワードを入力してください", type="password")
         if st.button("ログイン"):
-            if hash_password(password) == get_admin_password():
+            if hmac.compare_digest(hash_password(password), get_admin_password()):
                 st.session_state.authenticated = True
                 st.success("ログインしました")
-                st.experimental_rerun()
+                st.rerun()
             else:
                 st.error("パスワードが違います")
         return False
     return True
 
+@st.cache_data(show_spinner=False)
+def _load_config_cached(config_path, mtime):
+    """設定ファイルの読み込み本体（mtimeをキーにキャッシュ）"""
+    if orjson is not None:
+        with open(config_path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def load_config(config_type):
     """設定ファイルの読み込み"""
     config_path = CONFIG_FILES.get(config_type)
     if config_path and os.path.exists(config_path):
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return _load_config_cached(config_path, os.path.getmtime(config_path))
         except Exception as e:
             logging.error(f"設定ファイル読み込みエラー: {str(e)}")
     return {}
@@ -85,8 +156,22 @@ def save_config(config_type, data):
     config_path = CONFIG_FILES.get(config_type)
     if config_path:
         try:
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            # 一時ファイルに書いてからrenameし、クラッシュ時の破損を防ぐ
+            tmp_path = config_path + ".tmp"
+            if orjson is not None:
+                with open(tmp_path, 'wb') as f:
+                    f.write(orjson.dumps(
+                        data, option=orjson.OPT_INDENT_2 if _JSON_DEBUG else 0))
+                    f.flush()
+                    os.fsync(f.fileno())
+            else:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps(
+                        data, ensure_ascii=False, indent=4 if _JSON_DEBUG else None))
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, config_path)
+            _load_config_cached.clear()
             return True
         except Exception as e:
             logging.error(f"設定ファイル保存エラー: {str(e)}")
@@ -100,77 +185,108 @@ def save_metadata(metadata):
     """メタデータの保存"""
     return save_config("metadata", metadata)
 
+def _ratio_to_float(value):
+    """exifreadのRatio値をfloatへ変換"""
+    try:
+        return float(value.num) / float(value.den)
+    except AttributeError:
+        return float(value)
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def _exif_formatted(image_path, mtime_ns):
+    """EXIF解析と整形の本体（(パス, mtime)キーでメモ化）"""
+    with open(image_path, 'rb') as f:
+        tags = exifread.process_file(f, details=False)
+
+    exif_data = {}
+    if "Image Model" in tags:
+        exif_data["camera"] = str(tags["Image Model"]).strip()
+    if "EXIF LensModel" in tags:
+        exif_data["lens"] = str(tags["EXIF LensModel"]).strip()
+    if "EXIF ExposureTime" in tags:
+        exif_data["exposure"] = f"{tags['EXIF ExposureTime']}秒"
+    if "EXIF FNumber" in tags:
+        exif_data["f_number"] = f"f/{_ratio_to_float(tags['EXIF FNumber'].values[0]):.1f}"
+    if "EXIF ISOSpeedRatings" in tags:
+        exif_data["iso"] = f"ISO {tags['EXIF ISOSpeedRatings']}"
+    if "EXIF FocalLength" in tags:
+        exif_data["focal_length"] = f"{_ratio_to_float(tags['EXIF FocalLength'].values[0])}mm"
+    if "EXIF DateTimeOriginal" in tags:
+        try:
+            date_obj = datetime.datetime.strptime(
+                str(tags["EXIF DateTimeOriginal"]), '%Y:%m:%d %H:%M:%S')
+            exif_data["date"] = date_obj.strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+
+    return exif_data
+
 def get_exif_data(image_path):
-    """EXIF情報の取得"""
+    """EXIF情報の取得（整形結果を(パス, mtime)単位でメモ化）"""
     try:
-        with Image.open(image_path) as img:
-            exif = img._getexif()
-            if not exif:
-                return {}
-            
-            exif_data = {}
-            for tag_id, value in exif.items():
-                tag = TAGS.get(tag_id, tag_id)
-                if tag == "Model":
-                    exif_data["camera"] = str(value).strip()
-                elif tag == "LensModel":
-                    exif_data["lens"] = str(value).strip()
-                elif tag == "ExposureTime":
-                    if isinstance(value, tuple):
-                        exif_data["exposure"] = f"{value[0]}/{value[1]}秒"
-                    else:
-                        exif_data["exposure"] = f"{value}秒"
-                elif tag == "FNumber":
-                    if isinstance(value, tuple):
-                        exif_data["f_number"] = f"f/{value[0]/value[1]:.1f}"
-                    else:
-                        exif_data["f_number"] = f"f/{value:.1f}"
-                elif tag == "ISOSpeedRatings":
-                    exif_data["iso"] = f"ISO {value}"
-                elif tag == "FocalLength":
-                    if isinstance(value, tuple):
-                        exif_data["focal_length"] = f"{value[0]/value[1]}mm"
-                    else:
-                        exif_data["focal_length"] = f"{value}mm"
-                elif tag == "DateTimeOriginal":
-                    try:
-                        date_obj = datetime.datetime.strptime(str(value), '%Y:%m:%d %H:%M:%S')
-                        exif_data["date"] = date_obj.strftime('%Y-%m-%d')
-                    except:
-                        pass
-            
-            return exif_data
+        return dict(_exif_formatted(image_path, os.stat(image_path).st_mtime_ns))
     except Exception as e:
         logging.error(f"EXIF情報取得エラー: {str(e)}")
         return {}
 
+def _thumb_path(image_path, size):
+    """サムネイルキャッシュのファイルパスを生成"""
+    stat = os.stat(image_path)
+    key = hashlib.sha1(
+        f"{image_path}:{stat.st_mtime}:{stat.st_size}:{size}".encode('utf-8')
+    ).hexdigest()
+    return os.path.join(THUMB_DIR, f"{key}.webp")
+
+@st.cache_resource(max_entries=500, show_spinner=False)
+def _thumb_cached(image_path, mtime, size):
+    """サムネイルの生成本体（(パス, mtime, サイズ)キーでプロセス内にメモ化）"""
+    cached = _thumb_path(image_path, size)
+    # 元画像より新しいキャッシュがあればそのまま使う
+    if os.path.exists(cached) and os.path.getmtime(cached) >= mtime:
+        return cached
+    with Image.open(image_path) as img:
+        # JPEGはdraftモードでデコード時に1/2〜1/8へ縮小（PNG等では無視される）
+        img.draft("RGB", (size[0] * 2, size[1] * 2))
+        # 2段階縮小: BOXで2倍サイズまで粗く落としてからHAMMINGで仕上げる
+        img.thumbnail((size[0] * 2, size[1] * 2), Image.Resampling.BOX)
+        img.thumbnail(size, THUMB_FILTER)
+        # EXIFは渡さず、WebP（1パスでJPEG比約30%小）で保存して転送量を削減
+        img.convert("RGB").save(cached, "WEBP", quality=80, method=4)
+    return cached
+
 def create_thumbnail(image_path, size=(300, 300)):
-    """サムネイルの作成"""
+    """サムネイルの作成（ディスクキャッシュ付き）"""
     try:
-        with Image.open(image_path) as img:
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            return img
+        return _thumb_cached(image_path, os.path.getmtime(image_path), size)
     except Exception as e:
         logging.error(f"サムネイル作成エラー: {str(e)}")
         return None
 
-def delete_photo(img_path, photo, metadata):
+def thumb_static_url(thumb_path):
+    """サムネイルの静的配信URLを生成（enableStaticServing前提）"""
+    return f"/app/static/thumbs/{os.path.basename(thumb_path)}"
+
+def delete_photo(img_path, photo, category, metadata):
     """写真を削除"""
     try:
         os.remove(img_path)
-        if photo in metadata.get("photos", {}):
-            del metadata["photos"][photo]
+        removed = metadata.get("photos", {}).pop(photo, None) is not None
+        # カテゴリー別インデックスからも取り除く
+        category_photos = metadata.get("by_category", {}).get(category, [])
+        if photo in category_photos:
+            category_photos.remove(photo)
+            removed = True
+        if removed:
             save_metadata(metadata)
         return True
     except Exception as e:
         st.error(f"削除に失敗しました: {str(e)}")
         return False
 
-def show_photo_details(img_path, metadata):
-    """写真の詳細情報を表示"""
-    exif_data = get_exif_data(img_path)
-    combined_data = {**exif_data, **metadata}
-    
+def show_photo_details(photo, metadata):
+    """写真の詳細情報を表示（メタデータにキャッシュ済みのEXIFを使用）"""
+    combined_data = metadata.get("photos", {}).get(photo, {})
+
     st.markdown(f"""
     #### 撮影情報
     - 📸 カメラ: {combined_data.get('camera', '不明')}
@@ -182,17 +298,36 @@ def show_photo_details(img_path, metadata):
     - 📅 撮影日: {combined_data.get('date', '不明')}
     """)
 
-def display_photo_grid(photos, category):
-    """写真のグリッド表示"""
-    metadata = load_metadata()
-    
-    # カスタムCSS
+def _ensure_exif_cached(photos, category, metadata):
+    """EXIF未キャッシュの写真があれば解析して1回だけ保存"""
+    updated = False
+    for photo in photos:
+        entry = metadata.setdefault("photos", {}).setdefault(photo, {})
+        if "camera" not in entry:
+            entry.setdefault("category", category)
+            entry.update(get_exif_data(os.path.join(_CATEGORY_DIRS[category], photo)))
+            updated = True
+    if updated:
+        save_metadata(metadata)
+
+def inject_custom_css():
+    """カスタムCSSの注入（main()から1回だけ呼ぶ）"""
     st.markdown("""
     <style>
     .photo-container {
         position: relative;
         margin-bottom: 1rem;
     }
+    .photo-grid {
+        display: grid;
+        grid-template-columns: repeat(4, 1fr);
+        gap: 1rem;
+        margin-bottom: 1rem;
+    }
+    .photo-grid img {
+        width: 100%;
+        border-radius: 4px;
+    }
     .delete-button {
         position: absolute;
         top: 5px;
@@ -221,71 +356,160 @@ def display_photo_grid(photos, category):
     </style>
     """, unsafe_allow_html=True)
 
-    cols = st.columns(4)
-    for idx, photo in enumerate(photos):
-        col = cols[idx % 4]
-        with col:
-            img_path = os.path.join(UPLOAD_DIR, category, photo)
+def _render_photo_panel(photo, category, metadata, photos_meta):
+    """選択中の写真の操作パネル（削除・いいね・コメント・全画面）を表示"""
+    img_path = os.path.join(_CATEGORY_DIRS[category], photo)
+    st.markdown(f"#### 🖼️ {photos_meta.get(photo, {}).get('title', photo)}")
+
+    if st.session_state.authenticated:
+        if st.button("🗑️ 削除", key=f"delete_{photo}", help="写真を削除"):
+            if delete_photo(img_path, photo, category, metadata):
+                # トーストは再実行をまたいで表示されるためsleep不要
+                st.toast(f"✅ {photo} を削除しました")
+                st.rerun()
+
+    # いいね機能
+    if st.button("❤️ いいね", key=f"like_{photo}"):
+        st.session_state.user_likes.add(photo)
+        st.success("いいねしました！")
+
+    # 撮影情報（アップロード時にキャッシュしたEXIFを表示）
+    with st.expander("📷 撮影情報"):
+        show_photo_details(photo, metadata)
+
+    # コメント表示と投稿
+    with st.expander("💬 コメント"):
+        comments = photos_meta.get(photo, {}).get("comments", [])
+        for comment in comments:
+            st.write(f"- {comment}")
+        new_comment = st.text_input("コメントを追加", key=f"comment_{photo}")
+        if st.button("投稿", key=f"submit_comment_{photo}"):
+            if new_comment:
+                photos_meta.setdefault(photo, {}).setdefault(
+                    "comments", []).append(new_comment)
+                save_metadata(metadata)
+                st.success("コメントを投稿しました")
+                st.rerun()
+            else:
+                st.error("コメントを入力してください")
+
+    # 全画面表示ボタン
+    if st.button("🔍 全画面", key=f"full_{photo}"):
+        st.session_state.show_fullscreen = True
+        st.session_state.fullscreen_image = img_path
+        st.session_state.fullscreen_photo = photo
+        st.rerun()
+
+def display_photo_grid(photos, category):
+    """写真のグリッド表示"""
+    metadata = load_metadata()
+
+    # ディレクトリが前回描画から変わっていない場合はEXIFバックフィルを省略
+    category_dir = _CATEGORY_DIRS[category]
+    dir_mtime = os.path.getmtime(category_dir) if os.path.exists(category_dir) else 0
+    if st.session_state.get(f"grid_mtime_{category}") != dir_mtime:
+        _ensure_exif_cached(photos, category, metadata)
+        st.session_state[f"grid_mtime_{category}"] = dir_mtime
+
+    # クエリパラメータは1回だけ取り込んでURLから消す（以後のボタン操作を妨げない）
+    params = st.experimental_get_query_params()
+    if params:
+        if "page" in params:
+            try:
+                st.session_state.photo_page = max(0, int(params["page"][0]))
+            except ValueError:
+                pass
+        if "photo" in params:
+            st.session_state.selected_photo = params["photo"][0]
+        st.experimental_set_query_params()
+
+    # ページ分割（表示ページ分だけサムネイルを生成する）
+    all_photos = photos
+    total_pages = max(1, (len(photos) + PAGE_SIZE - 1) // PAGE_SIZE)
+    page = min(st.session_state.photo_page, total_pages - 1)
+    if total_pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        if prev_col.button("◀ 前へ", disabled=(page == 0), key="page_prev"):
+            st.session_state.photo_page = page - 1
+            st.rerun()
+        info_col.markdown(
+            f"<div style='text-align: center;'>{page + 1} / {total_pages} ページ</div>",
+            unsafe_allow_html=True)
+        if next_col.button("次へ ▶", disabled=(page >= total_pages - 1), key="page_next"):
+            st.session_state.photo_page = page + 1
+            st.rerun()
+    photos = photos[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+
+    photos_meta = metadata.setdefault("photos", {})
+
+    if st.session_state.authenticated:
+        # リンク遷移はセッション（ログイン状態）を失うため、管理者は従来のウィジェットグリッドで描画
+        cols = st.columns(4)
+        for idx, photo in enumerate(photos):
+            with cols[idx % 4]:
+                thumb = create_thumbnail(os.path.join(_CATEGORY_DIRS[category], photo))
+                if thumb:
+                    st.markdown(
+                        f'<img src="{thumb_static_url(thumb)}" loading="lazy" '
+                        f'style="width: 100%; border-radius: 4px;">',
+                        unsafe_allow_html=True)
+                    _render_photo_panel(photo, category, metadata, photos_meta)
+    else:
+        # 公開側はグリッド全体を1つのHTMLブロックで描画（ウィジェット数をO(写真数)からO(1)に）
+        cells = []
+        for photo in photos:
+            img_path = os.path.join(_CATEGORY_DIRS[category], photo)
             thumb = create_thumbnail(img_path)
             if thumb:
-                with st.container():
-                    st.image(thumb, use_column_width=True)
-                    
-                    if st.session_state.authenticated:
-                        if st.button("🗑️", key=f"delete_{photo}", help="写真を削除"):
-                            if delete_photo(img_path, photo, metadata):
-                                st.success(f"✅ {photo} を削除しました")
-                                time.sleep(1)
-                                st.experimental_rerun()
-                    
-                    # いいね機能
-                    if st.button("❤️ いいね", key=f"like_{photo}"):
-                        st.session_state.user_likes.add(photo)
-                        st.success("いいねしました！")
-                    
-                    # コメント表示と投稿
-                    with st.expander("💬 コメント"):
-                        comments = metadata.get("photos", {}).get(photo, {}).get("comments", [])
-                        for comment in comments:
-                            st.write(f"- {comment}")
-                        new_comment = st.text_input("コメントを追加", key=f"comment_{photo}")
-                        if st.button("投稿", key=f"submit_comment_{photo}"):
-                            if new_comment:
-                                comments.append(new_comment)
-                                metadata["photos"][photo]["comments"] = comments
-                                save_metadata(metadata)
-                                st.success("コメントを投稿しました")
-                                st.experimental_rerun()
-                            else:
-                                st.error("コメントを入力してください")
-                    
-                    # 全画面表示ボタン
-                    if st.button("🔍 全画面", key=f"full_{photo}"):
-                        st.session_state.show_fullscreen = True
-                        st.session_state.fullscreen_image = img_path
-                        st.session_state.fullscreen_photo = photo
-                        st.experimental_rerun()
-
-    # 全画面表示
+                cells.append(
+                    f'<a href="?photo={quote(photo)}&page={page}&category={quote(category)}" target="_self">'
+                    f'<img src="{thumb_static_url(thumb)}" loading="lazy"></a>')
+        st.markdown(
+            '<div class="photo-grid">' + "".join(cells) + '</div>',
+            unsafe_allow_html=True)
+
+        # 選択中の写真だけ操作パネルを表示
+        # （リンク先が別ページの写真でも出せるよう全件リストと照合する）
+        selected = st.session_state.selected_photo
+        if selected and selected in all_photos:
+            _render_photo_panel(selected, category, metadata, photos_meta)
+            if st.button("✖ パネルを閉じる", key="close_panel"):
+                st.session_state.selected_photo = None
+                st.rerun()
+
+    # 全画面表示（st.imageはメディアエンドポイント経由でバイナリ配信する）
     if st.session_state.show_fullscreen and st.session_state.fullscreen_image:
-        st.markdown(f"""
-        <div class="fullscreen-container">
-            <button onclick="window.location.reload();" style="position: absolute; top: 20px; right: 20px; background: none; border: none; color: white; font-size: 24px; cursor: pointer;">✖</button>
-            <img src="data:image/png;base64,{get_image_base64(st.session_state.fullscreen_image)}" class="fullscreen-image">
-            <div style="margin-top: 20px;">
-                <button onclick="window.location.reload();" style="padding: 10px 20px; font-size: 16px;">閉じる</button>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-def get_image_base64(image_path):
-    """画像をBase64エンコードする"""
-    try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode()
-    except Exception as e:
-        logging.error(f"画像エンコードエラー: {str(e)}")
-        return ""
+        st.image(st.session_state.fullscreen_image, use_column_width=True)
+        if st.button("✖ 閉じる", key="close_fullscreen"):
+            st.session_state.show_fullscreen = False
+            st.session_state.fullscreen_image = None
+            st.session_state.fullscreen_photo = None
+            st.rerun()
+
+@st.cache_data(show_spinner=False)
+def list_photos(category, dir_mtime):
+    """カテゴリー内の写真一覧を取得（ディレクトリmtimeをキーにキャッシュ）"""
+    category_dir = _CATEGORY_DIRS[category]
+    return [e.name for e in os.scandir(category_dir)
+            if e.is_file() and e.name.lower().endswith(('.jpg', '.jpeg', '.png'))]
+
+def _rebuild_category_index(metadata):
+    """旧形式データからカテゴリー別インデックスを再構築して保存"""
+    index = {}
+    for category in PHOTO_CATEGORIES:
+        category_dir = _CATEGORY_DIRS[category]
+        if os.path.exists(category_dir):
+            index[category] = list_photos(category, os.path.getmtime(category_dir))
+        else:
+            index[category] = []
+    metadata["by_category"] = index
+    save_metadata(metadata)
+
+def get_category_photos(category, metadata):
+    """カテゴリー内の写真一覧をインデックスから取得"""
+    if "by_category" not in metadata:
+        _rebuild_category_index(metadata)
+    return metadata["by_category"].get(category, [])
 
 def show_photo_gallery():
     """写真ギャラリーの表示"""
@@ -293,57 +517,58 @@ def show_photo_gallery():
         category = st.session_state.current_page
         st.title(f"📸 {category}")
         
-        # 写真の取得
-        category_dir = os.path.join(UPLOAD_DIR, category)
-        if os.path.exists(category_dir):
-            photos = [f for f in os.listdir(category_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            if photos:
-                display_photo_grid(photos, category)
-            else:
-                st.info(f"{category}の写真はまだありません")
+        # 写真の取得（カテゴリー別インデックスを参照）
+        photos = get_category_photos(category, load_metadata())
+        if photos:
+            display_photo_grid(photos, category)
+        else:
+            st.info(f"{category}の写真はまだありません")
     else:
         st.title("📸 写真ギャラリー")
         st.write("サイドバーからカテゴリーを選択してください")
 
-def save_uploaded_photo(file, category):
-    """写真のアップロードと保存"""
+def save_uploaded_photo(file, category, metadata):
+    """写真のアップロードと保存（メタデータの書き込みは呼び出し側で行う）"""
     try:
         # 保存先の確認・作成
-        save_dir = os.path.join(UPLOAD_DIR, category)
+        save_dir = _CATEGORY_DIRS[category]
         os.makedirs(save_dir, exist_ok=True)
-        
-        # ファイル名の検証と重複チェック
-        filename = file.name
+
+        # 内容のハッシュでファイル名を決定（同一内容の再アップロードは保存しない）
+        base, ext = os.path.splitext(file.name)
+        digest = hashlib.sha256(file.getbuffer()).hexdigest()[:16]
+        filename = f"{base}_{digest}{ext}"
         file_path = os.path.join(save_dir, filename)
-        
-        # 同名ファイルが存在する場合は番号を付加
-        base, ext = os.path.splitext(filename)
-        counter = 1
-        while os.path.exists(file_path):
-            filename = f"{base}_{counter}{ext}"
-            file_path = os.path.join(save_dir, filename)
-            counter += 1
-        
-        # ファイル保存
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
-        
-        # EXIF情報の取得と保存
+
+        with _upload_lock:
+            if not os.path.exists(file_path):
+                # ファイル保存（1MBずつストリーム書き込みしてメモリ使用量を抑える）
+                file.seek(0)
+                with open(file_path, "wb") as f:
+                    shutil.copyfileobj(file, f, length=1024 * 1024)
+
+        # サムネイルを先に生成しておく（初回表示時のエンコードを回避）
+        create_thumbnail(file_path)
+
+        # EXIF情報の取得
         exif_data = get_exif_data(file_path)
-        metadata = load_metadata()
-        
-        if "photos" not in metadata:
-            metadata["photos"] = {}
-            
-        metadata["photos"][filename] = {
-            "category": category,
-            "upload_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "title": os.path.splitext(filename)[0],
-            "comments": [],
-            **exif_data
-        }
-        save_metadata(metadata)
-        
+
+        # メタデータの更新は並列ワーカー間で競合しないようロック下で行う
+        with _upload_lock:
+            # 再アップロード（重複）時は既存のコメントや編集済みタイトルを保持する
+            entry = metadata.setdefault("photos", {}).setdefault(filename, {})
+            entry.setdefault("title", base)
+            entry.setdefault("comments", [])
+            entry.update({
+                "category": category,
+                "upload_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "digest": digest,
+                **exif_data
+            })
+            category_index = metadata.setdefault("by_category", {}).setdefault(category, [])
+            if filename not in category_index:
+                category_index.append(filename)
+
         return True, filename
     except Exception as e:
         logging.error(f"写真アップロードエラー: {str(e)}")
@@ -375,27 +600,36 @@ def manage_photos():
         if submit_button and uploaded_files:
             progress_text = "写真をアップロード中..."
             progress_bar = st.progress(0)
-            
+
             success_count = 0
             failed_files = []
-            
-            for i, file in enumerate(uploaded_files):
-                progress = (i + 1) / len(uploaded_files)
-                progress_bar.progress(progress)
-                
-                success, result = save_uploaded_photo(file, category)
-                if success:
-                    success_count += 1
-                    st.success(f"✅ {file.name} のアップロードに成功しました")
-                else:
-                    failed_files.append((file.name, result))
-                    st.error(f"❌ {file.name} のアップロードに失敗しました: {result}")
-            
+
+            # ファイル書き込みとEXIF解析はGILを解放するのでスレッドで並列化する
+            metadata = load_metadata()
+            with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as executor:
+                futures = {
+                    executor.submit(save_uploaded_photo, file, category, metadata): file
+                    for file in uploaded_files
+                }
+                for i, future in enumerate(as_completed(futures)):
+                    progress_bar.progress((i + 1) / len(uploaded_files))
+                    file = futures[future]
+                    success, result = future.result()
+                    if success:
+                        success_count += 1
+                        st.success(f"✅ {file.name} のアップロードに成功しました")
+                    else:
+                        failed_files.append((file.name, result))
+                        st.error(f"❌ {file.name} のアップロードに失敗しました: {result}")
+
+            # メタデータはまとめて1回だけ書き込む
+            if success_count > 0:
+                save_metadata(metadata)
+
             progress_bar.empty()
             if success_count > 0:
-                st.success(f"🎉 {success_count}個の写真をアップロードしました")
-                time.sleep(1)
-                st.experimental_rerun()
+                st.toast(f"🎉 {success_count}個の写真をアップロードしました")
+                st.rerun()
             
             if failed_files:
                 st.error("以下のファイルのアップロードに失敗しました:")
@@ -404,14 +638,12 @@ def manage_photos():
     
     # 既存の写真の表示と管理
     st.markdown("### アップロード済みの写真")
-    category_dir = os.path.join(UPLOAD_DIR, category)
-    if os.path.exists(category_dir):
-        photos = [f for f in os.listdir(category_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-        if photos:
-            st.write(f"📁 {category}カテゴリーの写真: {len(photos)}枚")
-            display_photo_grid(photos, category)
-        else:
-            st.info(f"📂 {category}カテゴリーにはまだ写真がありません")
+    photos = get_category_photos(category, load_metadata())
+    if photos:
+        st.write(f"📁 {category}カテゴリーの写真: {len(photos)}枚")
+        display_photo_grid(photos, category)
+    else:
+        st.info(f"📂 {category}カテゴリーにはまだ写真がありません")
 
 def manage_profile():
     """プロフィール管理"""
@@ -529,6 +761,8 @@ def show_contact_form():
 
 def main():
     """メイン関数"""
+    inject_custom_css()
+
     # サイドバーの設定
     st.sidebar.title("📸 Photo Portfolio")
     
@@ -557,8 +791,14 @@ def main():
         menu_items.append("---")
         menu_items.append("管理者ログイン")
     
+    # リンク遷移で新規セッションになった場合はクエリパラメータからカテゴリーを復元
+    params = st.experimental_get_query_params()
+    if ('menu' not in st.session_state
+            and params.get("category", [None])[0] in PHOTO_CATEGORIES):
+        st.session_state.menu = params["category"][0]
+
     # メニュー選択
-    selection = st.sidebar.selectbox("メニュー", menu_items)
+    selection = st.sidebar.selectbox("メニュー", menu_items, key="menu")
     
     # 選択に応じたページ表示
     if selection == "ホーム":
@@ -588,7 +828,7 @@ def main():
     elif selection == "ログアウト" and st.session_state.authenticated:
         st.session_state.authenticated = False
         st.success("ログアウトしました")
-        st.experimental_rerun()
+        st.rerun()
 
 if __name__ == "__main__":
     main()